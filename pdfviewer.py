@@ -5,12 +5,20 @@ from PIL import Image
 import io
 import os
 import json
+import html
+import re
+import hashlib
+import difflib
 import matplotlib.pyplot as plt
 
 # Constants
 FILE_FOLDER = 'files'
 JSON_FOLDER = 'JSON_FILES'
 EXCEL_FILE = os.path.join(FILE_FOLDER, 'pdf_details.xlsx')
+REMOVED_COLOR = (1, 0.6, 0.6)
+ADDED_COLOR = (0.6, 1, 0.6)
+RUNNING_MARGIN = 0.1  # Fraction of the page height searched for running headers/footers
+CONTEXT_WORDS = 5
 
 # Utility functions
 def list_files():
@@ -149,6 +157,275 @@ def display_pdf(file_path, zoom_level):
         st.write("No comments yet.")
 
 
+@st.cache_data(show_spinner=False)
+def file_hash(file_path, mtime):
+    """Return the SHA-256 of a file, used as the cache key for extracted blocks.
+
+    Cached on path and modification time so reruns don't re-read the whole file.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def block_hash(text):
+    """Hash a text block, ignoring whitespace differences introduced by extraction."""
+    return hashlib.blake2b(" ".join(text.split()).encode('utf-8'), digest_size=16).hexdigest()
+
+@st.cache_data(show_spinner=False)
+def extract_blocks(doc_hash, _file_path):
+    """Extract text blocks per page.
+
+    Each page is a dict with its height and a list of (rect, text, hash, words)
+    blocks, where words are the block's (rect, word) tuples in reading order.
+    Cached on the document hash only, so renamed copies of the same PDF reuse the result.
+    """
+    pages = []
+    with fitz.open(_file_path) as doc:
+        for page in doc:
+            textpage = page.get_textpage()
+            words = {}
+            for x0, y0, x1, y1, word, block_no, line_no, word_no in page.get_text("words", textpage=textpage):
+                words.setdefault(block_no, []).append(((line_no, word_no), (x0, y0, x1, y1), word))
+            blocks = []
+            for x0, y0, x1, y1, text, block_no, block_type in page.get_text("blocks", textpage=textpage, sort=True):
+                block_words = [(rect, word) for _, rect, word in sorted(words.get(block_no, []), key=lambda w: w[0])]
+                if block_type != 0 or not block_words:
+                    continue
+                text = " ".join(word for _, word in block_words)
+                blocks.append(((x0, y0, x1, y1), text, block_hash(text), block_words))
+            pages.append({'height': page.rect.height, 'blocks': blocks})
+    return pages
+
+def strip_running_blocks(pages):
+    """Drop running headers and footers such as "Page 5 of 30".
+
+    A block counts as running when it sits in the top or bottom margin and,
+    with its digits masked, appears at the same vertical position on at least
+    three pages and on more than half the pages of the document.
+    """
+    def running_key(block, height):
+        x0, y0, x1, y1 = block[0]
+        if y1 > height * RUNNING_MARGIN and y0 < height * (1 - RUNNING_MARGIN):
+            return None
+        return re.sub(r'\d+', '#', block[1]), round(y0)
+
+    counts = {}
+    for page in pages:
+        for key in {running_key(b, page['height']) for b in page['blocks']} - {None}:
+            counts[key] = counts.get(key, 0) + 1
+    running = {key for key, count in counts.items() if count >= 3 and count * 2 > len(pages)}
+    if not running:
+        return pages
+    return [
+        dict(page, blocks=[b for b in page['blocks'] if running_key(b, page['height']) not in running])
+        for page in pages
+    ]
+
+def align_words(old_blocks, new_blocks):
+    """Align two lists of (page_index, block) entries word by word.
+
+    Blocks are matched on their hashes first, and only the runs of unmatched
+    blocks are diffed word by word. Text that merely moved across a page break,
+    and so was split into different blocks, comes out as equal. Returns the
+    flattened (page_index, rect, word) lists of both sides and the opcodes
+    aligning them.
+    """
+    old_words, new_words, opcodes = [], [], []
+    matcher = difflib.SequenceMatcher(
+        None, [b[2] for _, b in old_blocks], [b[2] for _, b in new_blocks], autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        old_run = [(page_index, rect, word) for page_index, block in old_blocks[i1:i2] for rect, word in block[3]]
+        new_run = [(page_index, rect, word) for page_index, block in new_blocks[j1:j2] for rect, word in block[3]]
+        if tag == 'equal':
+            run_opcodes = [('equal', 0, len(old_run), 0, len(new_run))]
+        else:
+            run_opcodes = difflib.SequenceMatcher(
+                None, [w[2] for w in old_run], [w[2] for w in new_run], autojunk=False
+            ).get_opcodes()
+        offset_old, offset_new = len(old_words), len(new_words)
+        opcodes.extend(
+            (t, a + offset_old, b + offset_old, c + offset_new, d + offset_new) for t, a, b, c, d in run_opcodes
+        )
+        old_words += old_run
+        new_words += new_run
+    return old_words, new_words, opcodes
+
+def merge_rects(rects):
+    """Merge consecutive word rects on the same line into one highlight rect."""
+    merged = []
+    for x0, y0, x1, y1 in rects:
+        if merged:
+            mx0, my0, mx1, my1 = merged[-1]
+            if abs(y0 - my0) < 1 and abs(y1 - my1) < 1 and -1 < x0 - mx1 < y1 - y0:
+                merged[-1] = (mx0, my0, max(mx1, x1), my1)
+                continue
+        merged.append((x0, y0, x1, y1))
+    return merged
+
+def diff_block_ranges(old_blocks, new_blocks):
+    """Diff two lists of (page_index, block) entries word by word.
+
+    Each changed word is assigned to an (old_page, new_page) pair. Replaced
+    words pair with the page of their counterpart word; inserted or deleted
+    words pair with the page of the nearest unchanged word on the same page,
+    or with None when the page has no unchanged word to anchor on. Returns a
+    dict keyed by page pair, in document order, holding the rects to highlight
+    on either side and the (tag, before, old_text, new_text, after) changes
+    touching the pair, where before and after are a few words of context.
+    """
+    old_words, new_words, opcodes = align_words(old_blocks, new_blocks)
+    pairs = {}
+
+    def entry(key):
+        return pairs.setdefault(key, {'old_rects': [], 'new_rects': [], 'changes': []})
+
+    def anchor(words, other, lo, hi, other_lo, other_hi, page_index):
+        # Opcodes alternate with 'equal' ones, so the words just outside the
+        # changed run are the nearest unchanged words on either side
+        if lo > 0 and words[lo - 1][0] == page_index:
+            return other[other_lo - 1][0]
+        if hi < len(words) and words[hi][0] == page_index:
+            return other[other_hi][0]
+        return None
+
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            continue
+        keys = []
+        for k in range(i1, i2):
+            page_index, rect, _ = old_words[k]
+            if j2 > j1:
+                partner = new_words[min(j1 + k - i1, j2 - 1)][0]
+            else:
+                partner = anchor(old_words, new_words, i1, i2, j1, j2, page_index)
+            key = (page_index, partner)
+            entry(key)['old_rects'].append(rect)
+            keys.append(key)
+        for k in range(j1, j2):
+            page_index, rect, _ = new_words[k]
+            if i2 > i1:
+                partner = old_words[min(i1 + k - j1, i2 - 1)][0]
+            else:
+                partner = anchor(new_words, old_words, j1, j2, i1, i2, page_index)
+            key = (partner, page_index)
+            entry(key)['new_rects'].append(rect)
+            keys.append(key)
+        change = (
+            tag,
+            " ".join(w[2] for w in old_words[max(0, i1 - CONTEXT_WORDS):i1]),
+            " ".join(w[2] for w in old_words[i1:i2]),
+            " ".join(w[2] for w in new_words[j1:j2]),
+            " ".join(w[2] for w in new_words[j2:j2 + CONTEXT_WORDS]),
+        )
+        for key in dict.fromkeys(keys):
+            pairs[key]['changes'].append(change)
+
+    for pair in pairs.values():
+        pair['old_rects'] = merge_rects(pair['old_rects'])
+        pair['new_rects'] = merge_rects(pair['new_rects'])
+    return pairs
+
+@st.cache_data(show_spinner=False)
+def compare_documents(old_hash, new_hash, _old_path, _new_path):
+    """Compare two PDFs page by page.
+
+    Pages are first aligned on a hash of their block hashes, so unchanged pages
+    are skipped without any text comparison. Only the changed page ranges are
+    diffed, and only pages holding changed words are reported. Returns a list
+    of dicts with the old/new page index (None when the page's changed words
+    have no unchanged word to anchor on), the rects to highlight on either side
+    and the changed text.
+    """
+    old_pages = strip_running_blocks(extract_blocks(old_hash, _old_path))
+    new_pages = strip_running_blocks(extract_blocks(new_hash, _new_path))
+
+    def page_hash(page):
+        return hashlib.blake2b("".join(b[2] for b in page['blocks']).encode('ascii'), digest_size=16).hexdigest()
+
+    matcher = difflib.SequenceMatcher(
+        None, [page_hash(p) for p in old_pages], [page_hash(p) for p in new_pages], autojunk=False
+    )
+    results = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        old_blocks = [(i, b) for i in range(i1, i2) for b in old_pages[i]['blocks']]
+        new_blocks = [(j, b) for j in range(j1, j2) for b in new_pages[j]['blocks']]
+        for (old_page, new_page), pair in diff_block_ranges(old_blocks, new_blocks).items():
+            results.append({'old_page': old_page, 'new_page': new_page, **pair})
+    return results
+
+def render_highlighted_page(file_path, page_index, rects, color, zoom_level):
+    """Render a page with the given rects highlighted, without modifying the file."""
+    with fitz.open(file_path) as doc:
+        page = doc.load_page(page_index)
+        for rect in rects:
+            # Text extraction and annotations both use unrotated page coordinates,
+            # so word rects are passed through unchanged on rotated pages too
+            annot = page.add_highlight_annot(fitz.Rect(rect))
+            annot.set_colors(stroke=color)
+            annot.update()
+        return render_page(page, zoom_level)
+
+def format_change(before, old_text, new_text, after):
+    """Format a word-level change as HTML, with removed words struck through."""
+    parts = [html.escape(before)]
+    if old_text:
+        parts.append(f'<span style="background-color: #ff9999; text-decoration: line-through;">{html.escape(old_text)}</span>')
+    if new_text:
+        parts.append(f'<span style="background-color: #99ff99;">{html.escape(new_text)}</span>')
+    parts.append(html.escape(after))
+    return "<div>… " + " ".join(part for part in parts if part) + " …</div>"
+
+def display_compare(old_path, new_path, zoom_level):
+    old_hash = file_hash(old_path, os.path.getmtime(old_path))
+    new_hash = file_hash(new_path, os.path.getmtime(new_path))
+    with st.spinner("Comparing documents..."):
+        old_pages = extract_blocks(old_hash, old_path)
+        new_pages = extract_blocks(new_hash, new_path)
+        if not any(p['blocks'] for p in old_pages) or not any(p['blocks'] for p in new_pages):
+            st.warning("No extractable text found in one of the documents (scanned or image-only PDF), so differences can't be detected.")
+            return
+        results = compare_documents(old_hash, new_hash, old_path, new_path)
+
+    if not results:
+        st.success("No differences found.")
+        return
+
+    def label(result):
+        old_page = result['old_page'] + 1 if result['old_page'] is not None else "-"
+        new_page = result['new_page'] + 1 if result['new_page'] is not None else "-"
+        return f"Old page {old_page} / New page {new_page}"
+
+    st.write(f"{len(results)} changed page(s) found.")
+    selected = st.selectbox("Changed page", range(len(results)), format_func=lambda i: label(results[i]))
+    result = results[selected]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader(os.path.basename(old_path))
+        if result['old_page'] is not None:
+            img = render_highlighted_page(old_path, result['old_page'], result['old_rects'], REMOVED_COLOR, zoom_level)
+            st.image(img, caption=f"Page {result['old_page'] + 1}", use_column_width=True)
+        else:
+            st.info("No matching page: content added in the new version.")
+    with col2:
+        st.subheader(os.path.basename(new_path))
+        if result['new_page'] is not None:
+            img = render_highlighted_page(new_path, result['new_page'], result['new_rects'], ADDED_COLOR, zoom_level)
+            st.image(img, caption=f"Page {result['new_page'] + 1}", use_column_width=True)
+        else:
+            st.info("No matching page: content removed in the new version.")
+
+    if result['changes']:
+        st.subheader("Changed Text")
+        for _, before, old_text, new_text, after in result['changes']:
+            st.markdown(format_change(before, old_text, new_text, after), unsafe_allow_html=True)
+
+
 def display_dashboard():
     if os.path.exists(EXCEL_FILE):
         df = pd.read_excel(EXCEL_FILE)
@@ -233,7 +510,7 @@ def main():
 
     with st.sidebar:
         st.title("Navigation")
-        page = st.radio("Go to", ["Dashboard", "Document Library", "Settings"])
+        page = st.radio("Go to", ["Dashboard", "Document Library", "Compare Versions", "Settings"])
         st.session_state.page = page
 
     if st.session_state.page == "Dashboard":
@@ -257,6 +534,15 @@ def main():
                 display_pdf(file_path, zoom_level)
             else:
                 st.error("Unsupported file type")
+    elif st.session_state.page == "Compare Versions":
+        files = list_files()
+        old_file = st.sidebar.selectbox("Old version", files)
+        new_file = st.sidebar.selectbox("New version", files, index=1 if len(files) > 1 else 0)
+        zoom_level = st.sidebar.slider("Zoom Level", 1.0, 5.0, 2.0, 0.1)
+
+        st.title("Compare Versions")
+        if old_file and new_file:
+            display_compare(os.path.join(FILE_FOLDER, old_file), os.path.join(FILE_FOLDER, new_file), zoom_level)
     elif st.session_state.page == "Settings":
         display_settings()
 
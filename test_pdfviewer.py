@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("streamlit")
+
+import pdfviewer
+
+
+def make_block(text, y):
+    """Build a stubbed one-line block, one 40pt-wide rect per word."""
+    words = [((10 + 40 * k, y, 45 + 40 * k, y + 12), word) for k, word in enumerate(text.split())]
+    return ((10, y, words[-1][0][2], y + 12), text, pdfviewer.block_hash(text), words)
+
+
+def make_pages(paragraphs, per_page=3):
+    """Paginate paragraphs into stubbed extract_blocks output, with a running footer."""
+    chunks = [paragraphs[i:i + per_page] for i in range(0, len(paragraphs), per_page)]
+    pages = []
+    for n, chunk in enumerate(chunks):
+        blocks = [make_block(text, 100 + 100 * k) for k, text in enumerate(chunk)]
+        blocks.append(make_block(f"Page {n + 1} of {len(chunks)}", 800))
+        pages.append({'height': 842, 'blocks': blocks})
+    return pages
+
+
+def compare(monkeypatch, old_paragraphs, new_paragraphs):
+    docs = {'old': make_pages(old_paragraphs), 'new': make_pages(new_paragraphs)}
+    monkeypatch.setattr(pdfviewer, 'extract_blocks', lambda doc_hash, _file_path: docs[doc_hash])
+    pdfviewer.compare_documents.clear()
+    return pdfviewer.compare_documents('old', 'new', 'old.pdf', 'new.pdf')
+
+
+def write_flowed_pdf(path, paragraphs):
+    """Flow paragraphs over as many pages as needed, splitting them at page breaks."""
+    body = "".join(f"<p>{text}</p>" for text in paragraphs)
+    story = pdfviewer.fitz.Story(html=body)
+    writer = pdfviewer.fitz.DocumentWriter(path)
+    more = True
+    while more:
+        device = writer.begin_page(pdfviewer.fitz.paper_rect("a4"))
+        more, _ = story.place(pdfviewer.fitz.Rect(72, 72, 523, 770))
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+
+
+WORDS = "bank capital risk exposure institution supervisory liquidity requirement shock rate".split()
+PARAGRAPHS = [
+    f"Paragraph {i}: " + " ".join(random.Random(i).choices(WORDS, k=12)) for i in range(900)
+]
+
+
+def test_identical_documents(monkeypatch):
+    assert compare(monkeypatch, PARAGRAPHS, list(PARAGRAPHS)) == []
+
+
+def test_single_word_edit(monkeypatch):
+    new = list(PARAGRAPHS)
+    new[451] = PARAGRAPHS[451].replace("Paragraph 451:", "Paragraph 451a:")
+    results = compare(monkeypatch, PARAGRAPHS, new)
+    assert len(results) == 1
+    result = results[0]
+    assert (result['old_page'], result['new_page']) == (150, 150)
+    # Only the edited word is highlighted, not the whole paragraph
+    assert result['old_rects'] == [(50, 200, 85, 212)]
+    assert result['new_rects'] == [(50, 200, 85, 212)]
+    assert result['changes'] == [
+        ('replace', " ".join((PARAGRAPHS[450] + " Paragraph").split()[-5:]), '451:', '451a:', " ".join(new[451].split()[2:7]))
+    ]
+
+
+def test_inserted_paragraph_and_edit(monkeypatch):
+    new = list(PARAGRAPHS)
+    new[451] = PARAGRAPHS[451] + " As amended."
+    new.insert(16, "A newly inserted paragraph.")
+    results = compare(monkeypatch, PARAGRAPHS, new)
+
+    assert [(r['old_page'], r['new_page']) for r in results] == [(5, 5), (150, 150)]
+    assert [tag for tag, *_ in results[0]['changes']] == ['insert']
+    assert results[0]['changes'][0][3] == "A newly inserted paragraph."
+    assert results[1]['changes'][0][3] == "As amended."
+    assert len(results[1]['new_rects']) == 1
+
+
+def test_reflowed_pdf_reports_only_insertion(tmp_path):
+    paragraphs = [
+        f"Article {i}. " + " ".join(random.Random(i).choices(WORDS, k=60)) for i in range(120)
+    ]
+    old_path, new_path = str(tmp_path / "old.pdf"), str(tmp_path / "new.pdf")
+    write_flowed_pdf(old_path, paragraphs)
+    write_flowed_pdf(new_path, paragraphs[:10] + ["A newly inserted paragraph on exposures."] + paragraphs[10:])
+
+    pdfviewer.compare_documents.clear()
+    results = pdfviewer.compare_documents("reflow-old", "reflow-new", old_path, new_path)
+
+    with pdfviewer.fitz.open(new_path) as doc:
+        insert_page = next(i for i, page in enumerate(doc) if "newly inserted" in page.get_text())
+    assert [r['new_page'] for r in results] == [insert_page]
+    assert [(tag, new_text) for tag, _, _, new_text, _ in results[0]['changes']] == [
+        ('insert', "A newly inserted paragraph on exposures.")
+    ]
+
+
+def test_strip_running_blocks_keeps_body_bullets():
+    pages = [
+        {'height': 842, 'blocks': [make_block("•", 300), make_block(f"Point {n}", 300), make_block(f"Page {n + 1}", 800)]}
+        for n in range(4)
+    ]
+    stripped = pdfviewer.strip_running_blocks(pages)
+    assert [[b[1] for b in page['blocks']] for page in stripped] == [["•", f"Point {n}"] for n in range(4)]
+
+    # Two matching pages of a short document are not enough to call a block running
+    assert pdfviewer.strip_running_blocks(pages[:2]) == pages[:2]
+
+
+def test_highlight_on_rotated_page(tmp_path):
+    path = str(tmp_path / "rotated.pdf")
+    with pdfviewer.fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 100), "Rotated regulation text", fontsize=20)
+        page.set_rotation(90)
+        doc.save(path)
+
+    rect = pdfviewer.extract_blocks("rotated", path)[0]['blocks'][0][0]
+    img = pdfviewer.render_highlighted_page(path, 0, [rect], pdfviewer.REMOVED_COLOR, 1.0)
+
+    with pdfviewer.fitz.open(path) as doc:
+        shown = pdfviewer.fitz.Rect(rect) * doc[0].rotation_matrix
+    pixels = [
+        img.getpixel((x, y))
+        for x in range(int(shown.x0), int(shown.x1))
+        for y in range(int(shown.y0), int(shown.y1))
+    ]
+    highlighted = [px for px in pixels if px[0] > 200 and 120 < px[1] < 180]
+    assert len(highlighted) > len(pixels) // 4